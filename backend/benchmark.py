@@ -0,0 +1,385 @@
+"""Benchmarks for the effect functions and end-to-end render throughput.
+
+Synthetic test videos are generated once into --video-dir. Results are
+written as JSON and, when a baseline exists, compared against it; the exit
+status is 1 if any benchmark regressed by more than --threshold.
+
+Run from the backend directory:
+
+    python benchmark.py --output results.json
+    python benchmark.py --resolutions 480p,1080p --save-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+import cv2
+import numpy as np
+import psutil
+
+from main import (
+    BATCH_SIZE, PIPELINE_ACTIONS, VIDEO_FORMATS, apply_blur_effect, apply_brightness_adjustment,
+    apply_color_effect, apply_speed_effect, apply_text_overlay, plan_frame_geometry, prepare_frame,
+    process_video_async, process_video_batch
+)
+
+RESOLUTIONS = {
+    '480p': (854, 480),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+SUITES = ('prepare', 'effects', 'batch', 'render', 'startup')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+FPS = 30
+# Distinct decoded frames kept in memory per resolution; benchmarks cycle over them
+SAMPLE_FRAMES = 4
+# Memory the input of one batch benchmark may take, which caps 4K batches
+BATCH_MEMORY = 256 * 1024 ** 2
+
+# Effect params for process_video_batch, covering every action
+BATCH_PARAMS = {
+    'brightness_factor': 1.3,
+    'gamma': 1.1,
+    'effect_intensity': 1.0,
+    'blur_intensity': 1.0,
+    'overlay_text': 'VideoMaster benchmark',
+    'subtitles': "1\n00:00:00,000 --> 00:01:00,000\nBenchmark caption\n",
+    'speed_factor': 0.5,
+    'speed_interpolation': 'linear',
+}
+
+# Runs in a fresh interpreter: times importing the API module, a first request
+# to each light endpoint through the Lambda handler, then loading the video stack
+STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import main
+results = {'import': time.perf_counter() - started}
+for path in sys.argv[1:]:
+    event = {
+        'version': '2.0', 'routeKey': '$default', 'rawPath': path, 'rawQueryString': '',
+        'headers': {'host': 'localhost'}, 'isBase64Encoded': False,
+        'requestContext': {
+            'http': {'method': 'GET', 'path': path, 'protocol': 'HTTP/1.1', 'sourceIp': '127.0.0.1', 'userAgent': 'benchmark'},
+            'requestId': 'benchmark', 'routeKey': '$default', 'stage': '$default'
+        }
+    }
+    request_started = time.perf_counter()
+    main.handler(event, None)
+    results['GET ' + path] = time.perf_counter() - request_started
+results['video_stack_loaded_early'] = 'cv2' in sys.modules
+results['warm_up'] = main.warm_up()
+print(json.dumps(results))
+'''
+STARTUP_PATHS = ('/', '/health', '/job/00000000-0000-0000-0000-000000000000')
+
+# name -> job params for the frame preparation benchmark
+GEOMETRY_CASES = {
+    'passthrough': {},
+    'crop': {'crop_x': 0.25, 'crop_y': 0.25, 'crop_width': 0.5, 'crop_height': 0.5, 'width': 0.5, 'height': 0.5},
+    'downscale': {'width': 2 / 3, 'height': 2 / 3},
+    'crop_upscale': {'crop_x': 0.25, 'crop_y': 0.25, 'crop_width': 0.5, 'crop_height': 0.5, 'width': 1.0, 'height': 1.0},
+}
+
+
+def prepare_frame_per_frame_params(frame, params, spec):
+    # The frame preparation as it was before plan_frame_geometry: params are
+    # parsed for every frame and the resize always runs. Kept as the reference
+    # the planned prepare_frame is compared against.
+    original_width, original_height = spec['original_width'], spec['original_height']
+    crop_x = int(params.get('crop_x', 0))
+    crop_y = int(params.get('crop_y', 0))
+    crop_width = int(params.get('crop_width', original_width)) if params.get('crop_width') is not None else original_width
+    crop_height = int(params.get('crop_height', original_height)) if params.get('crop_height') is not None else original_height
+    frame = frame[crop_y:crop_y+crop_height, crop_x:crop_x+crop_width]
+    return cv2.resize(frame, (spec['width'], spec['height']))
+
+
+def generate_video(path, size, frame_total):
+    # A moving gradient with noise, so encoders and blurs see realistic detail
+    width, height = size
+    rng = np.random.default_rng(0)
+    x, y = np.meshgrid(np.linspace(0, 255, width, dtype=np.float32), np.linspace(0, 255, height, dtype=np.float32))
+    noise = rng.integers(0, 32, (height, width, 3), dtype=np.uint8)
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*VIDEO_FORMATS['mp4']['fourcc']), FPS, size)
+    if not out.isOpened():
+        raise RuntimeError(f"Failed to create {path}")
+    try:
+        for i in range(frame_total):
+            shift = i * 4
+            frame = np.dstack([(x + shift) % 256, (y + shift) % 256, (x + y + shift) % 256]).astype(np.uint8)
+            frame = cv2.add(frame, noise)
+            cv2.circle(frame, (width // 2 + shift % (width // 4), height // 2), height // 6, (255, 255, 255), -1)
+            out.write(frame)
+    finally:
+        out.release()
+
+
+def get_video(video_dir, resolution, frame_total):
+    path = os.path.join(video_dir, f"synthetic_{resolution}_{frame_total}.mp4")
+    if not os.path.exists(path):
+        os.makedirs(video_dir, exist_ok=True)
+        partial_path = f"{path}.{uuid.uuid4()}.mp4"
+        generate_video(partial_path, RESOLUTIONS[resolution], frame_total)
+        os.replace(partial_path, path)
+    return path
+
+
+def read_sample_frames(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    try:
+        while len(frames) < SAMPLE_FRAMES:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+    finally:
+        cap.release()
+    if not frames:
+        raise RuntimeError(f"Failed to decode {path}")
+    return frames
+
+
+def measure(fn, frame_total):
+    # Runs fn once and returns its frames/sec and peak memory. Peak memory is
+    # the larger of the traced Python/numpy allocations and the RSS growth,
+    # sampled every few milliseconds; OpenCV's internal buffers only show in
+    # the latter.
+    process = psutil.Process()
+    baseline_rss = process.memory_info().rss
+    peak = {'rss': baseline_rss}
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(0.005):
+            peak['rss'] = max(peak['rss'], process.memory_info().rss)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    tracemalloc.start()
+    sampler.start()
+    try:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+    finally:
+        done.set()
+        sampler.join()
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    peak_bytes = max(traced_peak, peak['rss'] - baseline_rss)
+    return {
+        'fps': round(frame_total / elapsed, 2),
+        'seconds': round(elapsed, 4),
+        'frames': frame_total,
+        'peak_mb': round(peak_bytes / 1024 ** 2, 2),
+    }
+
+
+def cycle(frames, count):
+    return [frames[i % len(frames)] for i in range(count)]
+
+
+def benchmark_prepare(frames, frame_total):
+    source_height, source_width = frames[0].shape[:2]
+    results = {}
+    for name, fractions in GEOMETRY_CASES.items():
+        params = {key: int(value * (source_width if key in ('crop_x', 'crop_width', 'width') else source_height))
+                  for key, value in fractions.items()}
+        width = params.get('width') or source_width
+        height = params.get('height') or source_height
+        spec = {'width': width, 'height': height, 'original_width': source_width, 'original_height': source_height}
+        spec.update(plan_frame_geometry(params, source_width, source_height, width, height))
+        inputs = cycle(frames, frame_total)
+        results[f"prepare_frame_per_frame_params:{name}"] = measure(
+            lambda: [prepare_frame_per_frame_params(frame, params, spec) for frame in inputs], frame_total
+        )
+        results[f"prepare_frame:{name}"] = measure(lambda: [prepare_frame(frame, spec) for frame in inputs], frame_total)
+    return results
+
+
+def benchmark_effects(frames, frame_total):
+    cases = {
+        'apply_color_effect:sepia': lambda frame: apply_color_effect(frame, 'sepia'),
+        'apply_color_effect:cool': lambda frame: apply_color_effect(frame, 'cool'),
+        'apply_color_effect:warm': lambda frame: apply_color_effect(frame, 'warm'),
+        'apply_blur_effect:gaussian': lambda frame: apply_blur_effect(frame, 'gaussian'),
+        'apply_blur_effect:motion': lambda frame: apply_blur_effect(frame, 'motion'),
+        'apply_blur_effect:radial': lambda frame: apply_blur_effect(frame, 'radial'),
+        'apply_brightness_adjustment': lambda frame: apply_brightness_adjustment(frame, 1.3, 1.1),
+        'apply_brightness_adjustment:preserve_colors': lambda frame: apply_brightness_adjustment(frame, 1.3, 1.1, True),
+        # The overlay draws in place, so it gets a copy like the pipeline would
+        'apply_text_overlay': lambda frame: apply_text_overlay(frame.copy(), 'VideoMaster benchmark'),
+    }
+    results = {}
+    inputs = cycle(frames, frame_total)
+    for name, effect in cases.items():
+        effect(frames[0])  # Warm up the cached tables, masks and sprites
+        results[name] = measure(lambda: [effect(frame) for frame in inputs], frame_total)
+    return results
+
+
+def benchmark_batch(frames, frame_total):
+    batch_size = max(2, min(BATCH_SIZE, BATCH_MEMORY // frames[0].nbytes))
+    batches = max(1, frame_total // batch_size)
+    batch = cycle(frames, batch_size)
+    results = {}
+    for speed_factor in (0.5, 2.0):
+        name = f"apply_speed_effect:{speed_factor}"
+        results[name] = measure(lambda: [apply_speed_effect(batch, speed_factor) for _ in range(batches)], batch_size * batches)
+    for action in PIPELINE_ACTIONS:
+        process_video_batch(batch[:2], action, BATCH_PARAMS)
+        results[f"process_video_batch:{action}"] = measure(
+            lambda: [process_video_batch(batch, action, BATCH_PARAMS) for _ in range(batches)], batch_size * batches
+        )
+    return results
+
+
+def benchmark_render(path, frame_total, output_dir):
+    results = {}
+    for output_format, format_config in VIDEO_FORMATS.items():
+        output_path = os.path.join(output_dir, f"benchmark_{uuid.uuid4()}.{format_config['ext']}")
+        job = {'status': 'queued', 'progress': 0}
+        params = {
+            'action': 'sepia',
+            'start_time': 0,
+            'end_time': 0,
+            'output_format': output_format,
+            'speed_factor': 1.0,
+        }
+        try:
+            result = measure(lambda: process_video_async('benchmark', path, output_path, params, job), frame_total)
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        if job['status'] != 'completed':
+            raise RuntimeError(f"Render to {output_format} failed: {job.get('error')}")
+        results[f"process_video_async:{output_format}"] = result
+    return results
+
+
+def benchmark_startup(runs):
+    # Median over `runs` cold interpreters of each step in STARTUP_SCRIPT
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT, *STARTUP_PATHS],
+            cwd=backend_dir, capture_output=True, text=True, check=True
+        )
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    if any(sample.pop('video_stack_loaded_early') for sample in samples):
+        print("WARNING: a light endpoint imported OpenCV during startup", file=sys.stderr)
+    return {
+        name: {'seconds': round(statistics.median(sample[name] for sample in samples), 4), 'runs': runs}
+        for name in samples[0]
+    }
+
+
+def compare(results, baseline, threshold):
+    # Returns a line per benchmark that got slower or used more memory than the
+    # baseline by more than threshold (a fraction). Startup steps only have a
+    # duration, so their time is compared instead of fps.
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if 'fps' not in current:
+            if current['seconds'] > previous['seconds'] * (1 + threshold):
+                regressions.append(f"{key}: {current['seconds']} s, baseline {previous['seconds']} s")
+            continue
+        if current['fps'] < previous['fps'] * (1 - threshold):
+            regressions.append(f"{key}: {current['fps']} fps, baseline {previous['fps']} fps")
+        if current['peak_mb'] > max(previous['peak_mb'], 1.0) * (1 + threshold):
+            regressions.append(f"{key}: {current['peak_mb']} MiB peak, baseline {previous['peak_mb']} MiB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--resolutions', default=','.join(RESOLUTIONS), help="Comma-separated subset of 480p, 1080p, 4k")
+    parser.add_argument('--suites', default=','.join(SUITES), help="Comma-separated subset of " + ', '.join(SUITES))
+    parser.add_argument('--frames', type=int, default=90, help="Frames per benchmark and per test video")
+    parser.add_argument('--startup-runs', type=int, default=5, help="Cold interpreters timed by the startup suite")
+    parser.add_argument('--video-dir', default='/tmp/videomaster_benchmark')
+    parser.add_argument('--output', help="Write the results JSON here instead of stdout")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.15, help="Allowed regression as a fraction, e.g. 0.15")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    resolutions = [resolution.strip().lower() for resolution in args.resolutions.split(',')]
+    suites = [suite.strip() for suite in args.suites.split(',')]
+    unknown = [name for name in resolutions if name not in RESOLUTIONS] + [name for name in suites if name not in SUITES]
+    if unknown:
+        parser.error(f"Unknown resolution or suite: {', '.join(unknown)}")
+
+    results = {}
+    if 'startup' in suites:
+        print("Running startup", file=sys.stderr)
+        for name, result in benchmark_startup(args.startup_runs).items():
+            results[f"startup/{name}"] = result
+    video_suites = [suite for suite in suites if suite != 'startup']
+    for resolution in resolutions if video_suites else []:
+        path = get_video(args.video_dir, resolution, args.frames)
+        frames = read_sample_frames(path)
+        runs = {
+            'prepare': lambda: benchmark_prepare(frames, args.frames),
+            'effects': lambda: benchmark_effects(frames, args.frames),
+            'batch': lambda: benchmark_batch(frames, args.frames),
+            'render': lambda: benchmark_render(path, args.frames, args.video_dir),
+        }
+        for suite in video_suites:
+            print(f"Running {suite} at {resolution}", file=sys.stderr)
+            for name, result in runs[suite]().items():
+                results[f"{suite}/{resolution}/{name}"] = result
+
+    report = {
+        'meta': {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'frames': args.frames,
+        },
+        'results': results,
+    }
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded + '\n')
+    else:
+        print(encoded)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            f.write(encoded + '\n')
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to store one", file=sys.stderr)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline['results'], args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+class MemoryJobStore:
+    # Process-local store: an LRU of job dicts where finished jobs expire after
+    # `ttl` seconds or once more than `max_jobs` are kept
+    def __init__(self, max_jobs=1000, ttl=3600):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def __contains__(self, job_id):
+        return job_id in self.jobs
+
+    def create(self, job_id, job):
+        with self.lock:
+            now = time.time()
+            job = dict(job, updated_at=now)
+            # Jobs can be created already finished, e.g. render cache hits
+            if job['status'] in FINISHED_STATUSES:
+                job['finished_at'] = now
+            self.jobs[job_id] = job
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            self.jobs.move_to_end(job_id)
+            return dict(job)
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields, updated_at=time.time())
+            if fields.get('status') in FINISHED_STATUSES:
+                job['finished_at'] = job['updated_at']
+            self.jobs.move_to_end(job_id)
+
+    def delete(self, job_id):
+        with self.lock:
+            self.jobs.pop(job_id, None)
+
+    def unfinished(self):
+        # Jobs still queued or processing, by id
+        with self.lock:
+            return {job_id: dict(job) for job_id, job in self.jobs.items() if job['status'] not in FINISHED_STATUSES}
+
+    def expire(self):
+        # Drops finished jobs past their TTL, then the least recently used
+        # finished jobs while over max_jobs. Returns the removed job ids.
+        now = time.time()
+        expired = []
+        with self.lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job['status'] in FINISHED_STATUSES]
+            overflow = len(self.jobs) - self.max_jobs
+            for job_id in finished:
+                if overflow > 0 or now - self.jobs[job_id].get('finished_at', 0) > self.ttl:
+                    del self.jobs[job_id]
+                    expired.append(job_id)
+                    overflow -= 1
+        return expired
+
+
+class SQLiteJobStore:
+    # Store backed by a SQLite file, shared by every uvicorn worker and job
+    # process on the host. Lookups go through the primary key index.
+    def __init__(self, path, max_jobs=1000, ttl=3600):
+        self.path = path
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.local = threading.local()
+        db = self.connect()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, finished_at REAL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+
+    def __getstate__(self):
+        # Connections can't cross process boundaries; workers reconnect lazily
+        return {'path': self.path, 'max_jobs': self.max_jobs, 'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+    def connect(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def __len__(self):
+        return self.connect().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def __contains__(self, job_id):
+        return self.connect().execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone() is not None
+
+    def create(self, job_id, job):
+        now = time.time()
+        finished_at = now if job['status'] in FINISHED_STATUSES else None
+        self.connect().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, data, updated_at, finished_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, job['status'], json.dumps(job), now, finished_at)
+        )
+
+    def get(self, job_id):
+        row = self.connect().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id, **fields):
+        db = self.connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is not None:
+                job = json.loads(row[0])
+                job.update(fields)
+                now = time.time()
+                finished_at = now if job['status'] in FINISHED_STATUSES else None
+                db.execute(
+                    "UPDATE jobs SET status = ?, data = ?, updated_at = ?, finished_at = COALESCE(finished_at, ?) WHERE job_id = ?",
+                    (job['status'], json.dumps(job), now, finished_at, job_id)
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def delete(self, job_id):
+        self.connect().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def unfinished(self):
+        rows = self.connect().execute("SELECT job_id, data FROM jobs WHERE finished_at IS NULL")
+        return {job_id: json.loads(data) for job_id, data in rows}
+
+    def expire(self):
+        db = self.connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in db.execute(
+                "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - self.ttl,)
+            )]
+            overflow = db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] - len(expired) - self.max_jobs
+            if overflow > 0:
+                expired += [row[0] for row in db.execute(
+                    "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at >= ? ORDER BY finished_at LIMIT ?",
+                    (time.time() - self.ttl, overflow)
+                )]
+            db.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in expired])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return expired
+
+
+class JobHandle:
+    # Dict-style view of one stored job handed to render workers. Writes go
+    # straight to the store so progress is visible to every API worker.
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def __getitem__(self, key):
+        return self.store.get(self.job_id)[key]
+
+    def __setitem__(self, key, value):
+        self.store.update(self.job_id, **{key: value})
+
+    def update(self, **fields):
+        self.store.update(self.job_id, **fields)
+
+
+def create_job_store(backend='memory', path=None, max_jobs=1000, ttl=3600):
+    if backend == 'sqlite':
+        return SQLiteJobStore(path, max_jobs, ttl)
+    if backend == 'memory':
+        return MemoryJobStore(max_jobs, ttl)
+    raise ValueError(f"Unknown job store backend: {backend}")
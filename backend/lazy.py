@@ -0,0 +1,32 @@
+import importlib
+import threading
+import time
+import types
+
+# Seconds each lazy module took to import, by module name
+load_times = {}
+load_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    # Stand-in for a module that is imported on first attribute access. The
+    # real module's namespace is then copied in, so later lookups are plain
+    # attribute reads without going through __getattr__ again.
+    def __getattr__(self, name):
+        ensure_loaded(self)
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            raise AttributeError(f"module {self.__name__!r} has no attribute {name!r}") from None
+
+
+def ensure_loaded(module):
+    if not isinstance(module, LazyModule) or module.__name__ in load_times:
+        return module
+    with load_lock:
+        if module.__name__ not in load_times:
+            started = time.perf_counter()
+            real = importlib.import_module(module.__name__)
+            module.__dict__.update(real.__dict__)
+            load_times[module.__name__] = time.perf_counter() - started
+    return module
@@ -0,0 +1,153 @@
+import math
+import threading
+
+# Upper bounds for latency-style histograms, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    # Base for metrics rendered in the Prometheus text exposition format. Each
+    # label combination gets its own series, created on first use.
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, label_values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(self.label_names, label_values, extra)} {format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    # A counter incremented explicitly, or read like a gauge from `callback`
+    # for totals that are already kept elsewhere and only ever grow
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=(), callback=None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def samples(self):
+        if self.callback is not None:
+            values = self.callback()
+            series = values if isinstance(values, dict) else {(): values}
+        else:
+            with self.lock:
+                series = dict(self.series)
+        return [('', key, (), value) for key, value in sorted(series.items())]
+
+
+class Gauge(Metric):
+    # A gauge set explicitly, or read from `callback` (returning a number or a
+    # dict of label value tuples to numbers) whenever metrics are rendered
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), callback=None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = value
+
+    def samples(self):
+        if self.callback is not None:
+            values = self.callback()
+            series = values if isinstance(values, dict) else {(): values}
+        else:
+            with self.lock:
+                series = dict(self.series)
+        return [('', key, (), value) for key, value in sorted(series.items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    samples.append(('_bucket', key, (('le', format_value(float(bound))),), cumulative))
+                samples.append(('_sum', key, (), series['sum']))
+                samples.append(('_count', key, (), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+
+registry = Registry()
+
+
+def counter(name, documentation, labels=(), callback=None):
+    return registry.register(Counter(name, documentation, labels, callback))
+
+
+def gauge(name, documentation, labels=(), callback=None):
+    return registry.register(Gauge(name, documentation, labels, callback))
+
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    return registry.register(Histogram(name, documentation, labels, buckets))
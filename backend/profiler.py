@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+local = threading.local()
+
+
+class SamplingProfiler:
+    # Samples the Python stacks of the threads working on one job every
+    # `interval` seconds and aggregates them as folded stacks
+    # ("thread;outer;...;inner count" lines), the input format of
+    # flamegraph.pl, speedscope and most other flame graph viewers
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.threads = {}
+        self.stacks = Counter()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def add_thread(self, thread=None):
+        thread = thread or threading.current_thread()
+        with self.lock:
+            self.threads[thread.ident] = thread
+
+    def start(self):
+        self.sampler = threading.Thread(target=self.run, name='videomaster-profiler', daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self.lock:
+                threads = list(self.threads.items())
+            for ident, thread in threads:
+                frame = frames.get(ident)
+                # Idents of finished threads may be reused by unrelated ones
+                if frame is None or not thread.is_alive():
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(thread.name)
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def current_profiler():
+    return getattr(local, 'profiler', None)
+
+
+def start_thread(profiler):
+    # Called first thing in threads a profiled job starts, so they are sampled
+    # too and can hand the profiler on to threads of their own
+    if profiler is not None:
+        local.profiler = profiler
+        profiler.add_thread()
+
+
+@contextmanager
+def profile_job(path, interval=0.005):
+    # Samples the current thread and the threads it starts via start_thread,
+    # writing the folded stacks to `path` when the block exits
+    profiler = SamplingProfiler(interval)
+    start_thread(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        local.profiler = None
+        profiler.write(path)
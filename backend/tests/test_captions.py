@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import main
+
+SRT = """1
+00:00:01,000 --> 00:00:02,000
+First line
+Second line
+
+2
+00:00:03,500 --> 00:00:04,000 X1:10 X2:100 Y1:10 Y2:50
+<i>Later</i>
+"""
+
+
+def test_cues_are_parsed_in_order():
+    assert main.parse_subtitles(SRT) == [
+        (1.0, 2.0, 'First line\nSecond line'),
+        (3.5, 4.0, '<i>Later</i>')
+    ]
+
+
+@pytest.mark.parametrize('subtitles', [
+    '\ufeff' + SRT,
+    SRT.replace('\n', '\r\n'),
+    SRT.replace('\n', '\r'),
+    # Separator lines holding only whitespace
+    SRT.replace('\n\n', '\n  \n'),
+    # Extra blank lines and dots for the milliseconds
+    '\n\n' + SRT.replace('\n\n', '\n\n\n').replace(',', '.'),
+])
+def test_bom_line_endings_and_spacing_are_accepted(subtitles):
+    assert main.parse_subtitles(subtitles) == main.parse_subtitles(SRT)
+
+
+def test_cues_are_sorted_by_start_time():
+    subtitles = "1\n00:00:05,000 --> 00:00:06,000\nB\n\n2\n00:00:01,000 --> 00:00:02,000\nA\n"
+    assert [cue[2] for cue in main.parse_subtitles(subtitles)] == ['A', 'B']
+
+
+def test_cue_without_text_is_skipped():
+    subtitles = "1\n00:00:01,000 --> 00:00:02,000\n\n2\n00:00:03,000 --> 00:00:04,000\nText\n"
+    assert main.parse_subtitles(subtitles) == [(3.0, 4.0, 'Text')]
+
+
+@pytest.mark.parametrize('timing', [
+    '00:00:xx,000 --> 00:00:02,000',
+    '00:01,000 --> 00:00:02,000',
+    '00:00:01,000 -->',
+    '00:00:01,000 --> 1:2:3:4',
+])
+def test_malformed_timestamps_are_rejected(timing):
+    with pytest.raises(ValueError, match='Invalid subtitle timestamp'):
+        main.parse_subtitles(f"1\n{timing}\nText\n")
+
+
+def test_text_without_cues_is_rejected():
+    with pytest.raises(ValueError, match='SRT'):
+        main.parse_subtitles('just some text')
+
+
+def test_caption_is_blended_onto_the_frames_it_covers():
+    # Ten frames a second, the cue covers 1.0 - 2.0s: it fades in from frame
+    # 10 (drawn at zero opacity) and is gone from frame 20
+    fps = 10.0
+    frames = [np.zeros((48, 96, 3), np.uint8) for _ in range(30)]
+    operations = [{'action': 'captions', 'subtitles': '1\n00:00:01,000 --> 00:00:02,000\nHi\n', 'font_scale': 0.5}]
+    output = main.run_pipeline(main.compile_pipeline(operations, {}), frames, fps)
+    drawn = [i for i, frame in enumerate(output) if frame.any()]
+    assert drawn == list(range(11, 20))
+    # Fully faded in after CAPTION_FADE_SECONDS
+    assert output[11].max() < output[15].max() == 255
+
+
+def test_caption_times_follow_the_start_time():
+    # Segments and previews pass the time of their first frame
+    frames = [np.zeros((48, 96, 3), np.uint8) for _ in range(10)]
+    operations = [{'action': 'captions', 'subtitles': '1\n00:00:01,000 --> 00:00:02,000\nHi\n', 'font_scale': 0.5}]
+    output = main.run_pipeline(main.compile_pipeline(operations, {}), frames, 10.0, start_time=1.5)
+    assert [i for i, frame in enumerate(output) if frame.any()] == list(range(0, 5))
@@ -0,0 +1,79 @@
+import cv2
+import numpy as np
+import pytest
+
+import main
+
+
+# The per-pixel float implementations the lookup tables replaced
+def reference_brightness(frame, brightness_factor=1.0, gamma=1.0, preserve_colors=False):
+    if preserve_colors:
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV).astype(float)
+        hsv[:,:,2] = np.clip(hsv[:,:,2] * brightness_factor, 0, 255)
+        hsv[:,:,2] = np.power(hsv[:,:,2] / 255.0, gamma) * 255.0
+        return cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
+    frame = np.clip(frame.astype(float) * brightness_factor, 0, 255)
+    return (np.power(frame / 255.0, gamma) * 255.0).astype(np.uint8)
+
+
+def reference_color(frame, effect_type, intensity=1.0):
+    if effect_type == 'sepia':
+        sepia_matrix = np.array([[0.272, 0.534, 0.131],
+                              [0.349, 0.686, 0.168],
+                              [0.393, 0.769, 0.189]]) * intensity
+        return cv2.transform(frame, sepia_matrix)
+    boost = min(1.0 + intensity * 0.2, 2.0)
+    reduce = max(1.0 - intensity * 0.2, 0.0)
+    frame = frame.astype(float)
+    if effect_type == 'cool':
+        frame[:,:,0] = frame[:,:,0] * boost
+        frame[:,:,2] = frame[:,:,2] * reduce
+    else:
+        frame[:,:,0] = frame[:,:,0] * reduce
+        frame[:,:,2] = frame[:,:,2] * boost
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(5)
+    # Random noise plus a ramp, so every 8-bit value occurs in every channel
+    ramp = np.repeat(np.arange(256, dtype=np.uint8).reshape(1, 256, 1), 3, axis=2)
+    return [rng.integers(0, 256, (48, 64, 3), dtype=np.uint8) for _ in range(3)] + [ramp]
+
+
+@pytest.mark.parametrize('brightness_factor', [0.3, 1.0, 1.5, 4.0])
+@pytest.mark.parametrize('gamma', [0.5, 1.0, 2.2])
+@pytest.mark.parametrize('preserve_colors', [False, True])
+def test_brightness_matches_per_pixel_math(frames, brightness_factor, gamma, preserve_colors):
+    for frame in frames:
+        expected = reference_brightness(frame, brightness_factor, gamma, preserve_colors)
+        actual = main.apply_brightness_adjustment(frame, brightness_factor, gamma, preserve_colors)
+        assert np.array_equal(actual, expected)
+        inplace = main.apply_brightness_adjustment(frame.copy(), brightness_factor, gamma, preserve_colors, inplace=True)
+        assert np.array_equal(inplace, expected)
+
+
+@pytest.mark.parametrize('effect_type', ['sepia', 'cool', 'warm'])
+@pytest.mark.parametrize('intensity', [0.0, 0.5, 1.0, 3.0, 6.0])
+def test_color_effects_match_per_pixel_math(frames, effect_type, intensity):
+    for frame in frames:
+        expected = reference_color(frame, effect_type, intensity)
+        assert np.array_equal(main.apply_color_effect(frame, effect_type, intensity), expected)
+        assert np.array_equal(main.apply_color_effect(frame.copy(), effect_type, intensity, inplace=True), expected)
+
+
+def test_fused_lookup_table_matches_applying_each_effect(frames):
+    operations = [
+        {'action': 'warm', 'effect_intensity': 1.5},
+        {'action': 'brighten', 'brightness_factor': 1.3, 'gamma': 0.8},
+        {'action': 'negative'},
+        {'action': 'darken', 'brightness_factor': 2.0}
+    ]
+    pipeline = main.compile_pipeline(operations, {})
+    for frame in frames:
+        expected = reference_color(frame, 'warm', 1.5)
+        expected = reference_brightness(expected, 1.3, 0.8)
+        expected = 255 - expected
+        expected = reference_brightness(expected, 0.5)
+        assert np.array_equal(main.run_pipeline(pipeline, [frame])[0], expected)
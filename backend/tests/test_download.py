@@ -0,0 +1,28 @@
+import asyncio
+import uuid
+
+import pytest
+from starlette.requests import Request
+
+import main
+
+
+def test_download_route_is_registered_once():
+    routes = [route for route in main.app.routes if getattr(route, 'path', None) == '/job/{job_id}/download']
+    assert len(routes) == 1
+
+
+@pytest.mark.parametrize('output_format', ['mp4', 'avi', 'mov'])
+def test_download_sends_the_format_mime_type(tmp_path, output_format):
+    output_path = tmp_path / f"edited.{output_format}"
+    output_path.write_bytes(b'video')
+    job_id = str(uuid.uuid4())
+    main.job_store.create(job_id, {
+        'status': 'completed', 'progress': 100, 'params': {'output_format': output_format}, 'output_path': str(output_path)
+    })
+    try:
+        request = Request({'type': 'http', 'method': 'GET', 'path': f"/job/{job_id}/download", 'headers': []})
+        response = asyncio.run(main.download_video(job_id, request))
+        assert response.media_type == main.VIDEO_FORMATS[output_format]['mime']
+    finally:
+        main.job_store.delete(job_id)
@@ -0,0 +1,67 @@
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+@pytest.mark.parametrize('action', ['brighten', 'darken'])
+@pytest.mark.parametrize('brightness_factor', [0, -0.5])
+def test_non_positive_brightness_factor_is_a_bad_request(action, brightness_factor):
+    with pytest.raises(HTTPException) as raised:
+        main.check_pipeline([{'action': action}], {'brightness_factor': brightness_factor})
+    assert raised.value.status_code == 400
+
+
+def test_brightness_factor_set_per_operation_is_checked():
+    operations = [{'action': 'brighten'}, {'action': 'darken', 'brightness_factor': 0}]
+    with pytest.raises(HTTPException) as raised:
+        main.check_pipeline(operations, {'brightness_factor': 1.5})
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize('operation', [
+    {'action': 'brighten', 'gamma': 0},
+    {'action': 'darken', 'gamma': -1},
+    {'action': 'overlay_text', 'overlay_text': 'Hello', 'font_scale': 0},
+    {'action': 'overlay_text', 'overlay_text': 'Hello', 'text_position': '1,2,3'},
+    {'action': 'overlay_text', 'overlay_text': 'Hello', 'text_color': '255,255'},
+    {'action': 'captions', 'subtitles': '1\n00:00:00,000 --> 00:00:01,000\nHi', 'font_scale': -1},
+])
+def test_invalid_effect_settings_are_a_bad_request(operation):
+    with pytest.raises(HTTPException) as raised:
+        main.check_pipeline([operation], {})
+    assert raised.value.status_code == 400
+
+
+def geometry(**params):
+    return {'width': None, 'height': None, 'crop_x': 0, 'crop_y': 0, 'crop_width': None, 'crop_height': None, 'speed_factor': 1.0, **params}
+
+
+@pytest.mark.parametrize('params', [
+    geometry(crop_x=64),
+    geometry(crop_y=100, crop_height=10),
+    geometry(crop_x=-1),
+    geometry(width=-10),
+    geometry(speed_factor=0),
+])
+def test_invalid_geometry_is_a_bad_request(params):
+    source = {'width': 64, 'height': 48}
+    with pytest.raises(HTTPException) as raised:
+        main.validate_geometry(params, source)
+    assert raised.value.status_code == 400
+
+
+def test_crop_overlapping_the_frame_is_accepted():
+    # Parts outside the frame are clipped when rendering
+    main.validate_geometry(geometry(crop_x=60, crop_y=40, crop_width=100, crop_height=100), {'width': 64, 'height': 48})
+
+
+@pytest.mark.parametrize('operations', [None, '[{"action": "bogus"}]'])
+def test_unknown_action_is_a_bad_request(operations):
+    with pytest.raises(HTTPException) as raised:
+        main.parse_operations(operations, 'bogus')
+    assert raised.value.status_code == 400
+
+
+def test_single_action_becomes_one_operation():
+    assert main.parse_operations(None, 'sepia') == [{'action': 'sepia'}]
@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import main
+
+
+def numbered_frames(count):
+    return [np.full((4, 4, 3), i, np.uint8) for i in range(count)]
+
+
+def values(frames):
+    return [int(frame[0, 0, 0]) for frame in frames]
+
+
+def test_frames_are_written_in_order_with_several_workers():
+    rng = random.Random(3)
+
+    def effect(frame, t):
+        # Workers finish out of order
+        time.sleep(rng.random() * 0.002)
+        return frame + 1
+    written = []
+    stats = main.run_frame_pipeline(numbered_frames(100), effect, written.append, workers=4)
+    assert values(written) == list(range(1, 101))
+    assert stats['frames_written'] == 100
+    assert stats['effect_workers'] == 4
+
+
+def test_effect_gets_each_frame_time():
+    times = {}
+
+    def effect(frame, t):
+        times[int(frame[0, 0, 0])] = t
+        return frame
+    main.run_frame_pipeline(numbered_frames(10), effect, lambda frame: None, workers=2, fps=5.0, start_time=2.0)
+    assert times == {i: 2.0 + i / 5.0 for i in range(10)}
+
+
+def test_repeated_frames_reuse_the_previous_output():
+    # Slow motion yields the same frame object several times in a row
+    frames = numbered_frames(3)
+    stream = [frames[0], frames[0], frames[1], frames[2], frames[2], frames[2]]
+    calls = []
+
+    def effect(frame, t):
+        calls.append(int(frame[0, 0, 0]))
+        return frame + 10
+    written = []
+    main.run_frame_pipeline(stream, effect, written.append, workers=2)
+    assert values(written) == [10, 10, 11, 12, 12, 12]
+    assert sorted(calls) == [0, 1, 2]
+
+
+def test_queues_bound_how_far_decoding_runs_ahead(monkeypatch):
+    monkeypatch.setattr(main, 'PIPELINE_QUEUE_SIZE', 2)
+    read = []
+
+    def frames():
+        for frame in numbered_frames(50):
+            read.append(frame)
+            yield frame
+    lead = []
+
+    def write(frame):
+        # The writer is the bottleneck
+        time.sleep(0.002)
+        lead.append(len(read) - len(lead))
+    main.run_frame_pipeline(frames(), None, write, workers=1)
+    # In flight: the frame being written, two in each queue, and one held by
+    # the effect worker and one by the reader
+    assert max(lead) <= 1 + 2 + 1 + 2 + 1
+    assert len(lead) == 50
+
+
+@pytest.mark.parametrize('stage', ['read', 'effect', 'write'])
+def test_errors_stop_the_pipeline_and_are_raised(stage):
+    def frames():
+        for i, frame in enumerate(numbered_frames(200)):
+            if stage == 'read' and i == 20:
+                raise RuntimeError('read failed')
+            yield frame
+
+    def effect(frame, t):
+        if stage == 'effect' and frame[0, 0, 0] == 20:
+            raise RuntimeError('effect failed')
+        return frame
+
+    def write(frame):
+        if stage == 'write' and frame[0, 0, 0] == 20:
+            raise RuntimeError('write failed')
+
+    with pytest.raises(RuntimeError, match=f"{stage} failed"):
+        main.run_frame_pipeline(frames(), effect, write, workers=3)
+    assert not any(thread.name.startswith('videomaster-') and thread.is_alive() for thread in threading.enumerate())
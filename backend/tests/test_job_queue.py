@@ -0,0 +1,87 @@
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    # One worker, one queue slot, and renders that block until released
+    monkeypatch.setattr(main, 'JOB_WORKERS', 1)
+    monkeypatch.setattr(main, 'JOB_QUEUE_SIZE', 1)
+    monkeypatch.setattr(main, 'job_queue', deque())
+    monkeypatch.setattr(main, 'running_jobs', set())
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(main, 'job_executor', executor)
+    release = threading.Event()
+    started = []
+
+    def render(job_id, input_path, output_path, params, job):
+        started.append((job_id, threading.current_thread().name))
+        release.wait(10)
+        job.update(status='completed', progress=100)
+    monkeypatch.setattr(main, 'process_video_async', render)
+
+    job_ids = []
+    def submit():
+        job_id = str(uuid.uuid4())
+        main.job_store.create(job_id, {'status': 'queued', 'progress': 0, 'submitted_at': time.time(), 'params': {}, 'input_path': '', 'output_path': ''})
+        job_ids.append(job_id)
+        main.submit_job(job_id)
+        return job_id
+    yield submit, release, started
+    release.set()
+    executor.shutdown()
+    for job_id in job_ids:
+        main.job_store.delete(job_id)
+
+
+def wait_for(condition):
+    deadline = time.time() + 10
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_jobs_render_on_the_pool_not_the_caller(renders):
+    submit, release, started = renders
+    job_id = submit()
+    # submit_job returns while the render is still running
+    wait_for(lambda: started)
+    assert started[0][0] == job_id
+    assert started[0][1] != threading.current_thread().name
+    assert main.job_store.get(job_id)['status'] == 'processing'
+    release.set()
+    wait_for(lambda: main.job_store.get(job_id)['status'] == 'completed')
+
+
+def test_jobs_beyond_the_workers_wait_in_order(renders):
+    submit, release, started = renders
+    first = submit()
+    second = submit()
+    wait_for(lambda: started)
+    assert [job_id for job_id, _ in started] == [first]
+    assert main.job_store.get(second)['status'] == 'queued'
+    assert main.get_queue_position(second) == 1
+    assert main.running_jobs == {first}
+
+    release.set()
+    wait_for(lambda: main.job_store.get(second)['status'] == 'completed')
+    assert [job_id for job_id, _ in started] == [first, second]
+    assert not main.running_jobs and not main.job_queue
+
+
+def test_full_queue_rejects_new_jobs(renders):
+    submit, release, started = renders
+    submit()
+    submit()
+    with pytest.raises(HTTPException) as raised:
+        submit()
+    assert raised.value.status_code == 503
+    assert len(main.job_queue) == 1
@@ -0,0 +1,59 @@
+import pytest
+
+import job_store
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(max_jobs=1000, ttl=3600):
+        return job_store.create_job_store(request.param, str(tmp_path / 'jobs.sqlite3'), max_jobs, ttl)
+    return make
+
+
+def test_job_created_finished_is_kept_until_its_ttl(make_store):
+    # Render cache hits are stored already completed
+    store = make_store(ttl=3600)
+    store.create('hit', {'status': 'completed', 'progress': 100})
+    assert store.expire() == []
+    assert 'hit' in store
+
+
+def test_job_created_finished_expires_after_its_ttl(make_store):
+    store = make_store(ttl=-1)
+    store.create('hit', {'status': 'completed', 'progress': 100})
+    assert store.expire() == ['hit']
+    assert 'hit' not in store
+
+
+def test_job_finished_by_update_expires_after_its_ttl(make_store):
+    store = make_store(ttl=-1)
+    store.create('job', {'status': 'queued', 'progress': 0})
+    assert store.expire() == []
+    store.update('job', status='failed', error='boom')
+    assert store.expire() == ['job']
+
+
+def test_unfinished_jobs_are_never_expired(make_store):
+    store = make_store(max_jobs=1, ttl=-1)
+    store.create('queued', {'status': 'queued'})
+    store.create('processing', {'status': 'processing'})
+    assert store.expire() == []
+    assert len(store) == 2
+
+
+def test_finished_jobs_over_max_jobs_are_expired(make_store):
+    store = make_store(max_jobs=2)
+    for job_id in ('a', 'b', 'c'):
+        store.create(job_id, {'status': 'completed'})
+    assert store.expire() == ['a']
+    assert len(store) == 2
+
+
+def test_unfinished_lists_queued_and_processing_jobs(make_store):
+    store = make_store()
+    store.create('queued', {'status': 'queued'})
+    store.create('processing', {'status': 'queued'})
+    store.update('processing', status='processing')
+    store.create('done', {'status': 'completed'})
+    assert sorted(store.unfinished()) == ['processing', 'queued']
+    assert store.unfinished()['processing']['status'] == 'processing'
@@ -0,0 +1,31 @@
+import threading
+
+import main
+
+
+def http_event(path):
+    # Minimal API Gateway HTTP API (payload 2.0) request
+    return {
+        'version': '2.0', 'routeKey': '$default', 'rawPath': path, 'rawQueryString': '', 'headers': {'host': 'localhost'},
+        'requestContext': {'http': {'method': 'GET', 'path': path, 'protocol': 'HTTP/1.1', 'sourceIp': '127.0.0.1'}, 'stage': '$default'},
+        'isBase64Encoded': False
+    }
+
+
+def test_background_work_starts_once_across_invocations(monkeypatch):
+    stop = threading.Event()
+    orphan_scans = []
+    monkeypatch.setattr(main, 'background_started', False)
+    monkeypatch.setattr(main, 'mangum_handler', None)
+    monkeypatch.setattr(main, 'run_job_janitor', stop.wait)
+    monkeypatch.setattr(main, 'fail_orphaned_jobs', lambda: orphan_scans.append(1))
+    janitors = lambda: [thread for thread in threading.enumerate() if thread.name == 'videomaster-janitor' and thread.is_alive()]
+    before = len(janitors())
+    try:
+        for _ in range(5):
+            response = main.handler(http_event('/'), None)
+            assert response['statusCode'] == 200
+        assert len(janitors()) == before + 1
+        assert len(orphan_scans) == 1
+    finally:
+        stop.set()
@@ -0,0 +1,38 @@
+import numpy as np
+
+import main
+
+
+def test_compiled_operations_are_timed_by_action():
+    timer = main.OperationTimer()
+    operations = [{'action': 'warm'}, {'action': 'brighten'}, {'action': 'gaussian_blur'}, {'action': 'trim'}]
+    pipeline = main.compile_pipeline(operations, {'brightness_factor': 1.2}, timer=timer)
+    frames = [np.full((48, 64, 3), 100, np.uint8) for _ in range(3)]
+    main.run_pipeline(pipeline, frames)
+    # warm and brighten are folded into one lookup table; trim compiles to nothing
+    assert set(timer.seconds) == {'color_lut', 'gaussian_blur'}
+    assert all(seconds > 0 for seconds in timer.seconds.values())
+
+
+def test_job_metrics_use_fixed_labels():
+    job = {
+        'status': 'completed',
+        'params': {'action': 'trim', 'operations': [{'action': 'sepia'}, {'action': 'gaussian_blur'}]},
+        'timings': {
+            'decode': 0.1, 'prepare': 0.0, 'effect': 0.2, 'encode': 0.1,
+            'operations': {'color_lut': 0.05, 'gaussian_blur': 0.15},
+            'total': 0.5, 'frames': 10, 'fps': 20.0
+        }
+    }
+    main.record_job_metrics(job)
+    rendered = main.metrics.registry.render()
+    assert 'videomaster_job_operation_seconds_count{action="gaussian_blur"} 1' in rendered
+    assert 'actions=' not in rendered
+    assert 'videomaster_batch_seconds' not in rendered
+
+
+def test_render_cache_events_are_a_counter():
+    rendered = main.metrics.registry.render()
+    assert '# TYPE videomaster_render_cache_events_total counter' in rendered
+    assert 'videomaster_render_cache_events_total{event="hits"}' in rendered
+    assert '# TYPE videomaster_render_cache_events gauge' not in rendered
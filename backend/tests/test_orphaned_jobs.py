@@ -0,0 +1,24 @@
+import job_store
+import main
+
+
+def test_jobs_of_a_dead_api_process_are_failed(tmp_path, monkeypatch):
+    store = job_store.create_job_store('sqlite', str(tmp_path / 'jobs.sqlite3'), ttl=-1)
+    monkeypatch.setattr(main, 'job_store', store)
+    # A previous server's process, gone after a restart
+    dead_owner = {'pid': main.os.getpid(), 'started': 0.0}
+    store.create('orphan-queued', {'status': 'queued', 'owner': dead_owner})
+    store.create('orphan-processing', {'status': 'queued', 'owner': dead_owner})
+    store.update('orphan-processing', status='processing')
+    store.create('legacy', {'status': 'queued'})
+    store.create('live', {'status': 'queued', 'owner': main.get_job_owner()})
+    
+    main.fail_orphaned_jobs()
+    
+    for job_id in ('orphan-queued', 'orphan-processing', 'legacy'):
+        job = store.get(job_id)
+        assert job['status'] == 'failed'
+        assert 'restarted' in job['error']
+    assert store.get('live')['status'] == 'queued'
+    # Failed orphans are expired like any finished job
+    assert sorted(store.expire()) == ['legacy', 'orphan-processing', 'orphan-queued']
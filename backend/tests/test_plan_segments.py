@@ -0,0 +1,35 @@
+import pytest
+
+import main
+
+
+def assert_covers(segments, start_frame, end_frame):
+    assert segments[0][0] == start_frame
+    assert segments[-1][1] == end_frame
+    for (_, previous_end), (next_start, _) in zip(segments, segments[1:]):
+        assert next_start == previous_end + 1
+
+
+@pytest.mark.parametrize('workers, start_frame, end_frame', [
+    (8, 0, 1799),
+    (3, 10, 700),
+    (4, 0, 999),
+    (16, 0, 7199),
+])
+def test_never_more_segments_than_workers(monkeypatch, workers, start_frame, end_frame):
+    monkeypatch.setattr(main, 'RENDER_WORKERS', workers)
+    segments = main.plan_segments(start_frame, end_frame, 30.0)
+    assert_covers(segments, start_frame, end_frame)
+    assert 1 < len(segments) <= workers
+    # Boundaries stay on the 2 second grid
+    for segment_start, _ in segments[1:]:
+        assert (segment_start - start_frame) % 60 == 0
+
+
+def test_segments_start_on_keyframes(monkeypatch):
+    monkeypatch.setattr(main, 'RENDER_WORKERS', 4)
+    keyframes = list(range(0, 1800, 250))
+    segments = main.plan_segments(0, 1799, 30.0, keyframes)
+    assert_covers(segments, 0, 1799)
+    assert len(segments) <= 4
+    assert all(segment_start in keyframes for segment_start, _ in segments)
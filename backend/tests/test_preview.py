@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import main
+
+SOURCE = {'source_id': 'test', 'path': '/nonexistent.mp4', 'fps': 30.0, 'width': 64, 'height': 48, 'frame_count': 60}
+
+
+def numbered_frames(count):
+    return [np.full((48, 64, 3), i, np.uint8) for i in range(count)]
+
+
+def render(frames, **params):
+    params = {'action': 'trim', 'speed_factor': 1.0, 'speed_interpolation': 'none', **params}
+    params['operations'] = main.parse_operations(None, params['action'])
+    return main.render_preview_frames(frames, SOURCE, params, 64)
+
+
+@pytest.mark.parametrize('action', ['trim', 'speed'])
+def test_speed_is_applied_once(action):
+    # 60 source frames at 2x give 30 output frames however the speed is requested
+    frames = render(numbered_frames(60), action=action, speed_factor=2.0)
+    assert len(frames) == 30
+    assert [int(frame[0, 0, 0]) for frame in frames[:3]] == [0, 2, 4]
+
+
+def test_slow_motion_repeats_frames():
+    frames = render(numbered_frames(10), action='speed', speed_factor=0.5)
+    assert len(frames) == 20
+
+
+@pytest.mark.parametrize('action, speed_factor', [('reverse', 1.0), ('trim', -1.0)])
+def test_reverse_plays_the_clip_backwards(action, speed_factor):
+    frames = render(numbered_frames(10), action=action, speed_factor=speed_factor)
+    assert [int(frame[0, 0, 0]) for frame in frames] == list(range(9, -1, -1))
+
+
+@pytest.mark.parametrize('operation_interpolation, blended', [(None, True), ('simple', False)])
+def test_speed_operation_sets_its_own_interpolation(operation_interpolation, blended):
+    params = {'action': 'speed', 'speed_factor': 0.5, 'speed_interpolation': 'linear'}
+    operation = {'action': 'speed'}
+    if operation_interpolation:
+        operation['speed_interpolation'] = operation_interpolation
+    params['operations'] = [operation]
+    frames = main.render_preview_frames([np.full((48, 64, 3), v, np.uint8) for v in (0, 100)], SOURCE, params, 64)
+    # Half speed puts the second output frame halfway between the two sources
+    assert int(frames[1][0, 0, 0]) == (50 if blended else 0)
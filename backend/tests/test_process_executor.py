@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Submits one job through the API process's queue and waits for it, then lets
+# the interpreter exit, which shuts the job executor down
+RUN_JOB = textwrap.dedent("""
+    import sys, time, uuid
+    import main
+
+    job_id = str(uuid.uuid4())
+    params = {
+        'action': 'negative', 'operations': [{'action': 'negative'}], 'start_time': 0, 'end_time': 0,
+        'output_format': 'avi', 'parallel_render': True
+    }
+    main.job_store.create(job_id, {
+        'status': 'queued', 'progress': 0, 'submitted_at': time.time(), 'params': params,
+        'input_path': sys.argv[1], 'output_path': sys.argv[2], 'cache_key': None
+    })
+    main.submit_job(job_id)
+    while main.job_store.get(job_id)['status'] not in ('completed', 'failed'):
+        time.sleep(0.1)
+    job = main.job_store.get(job_id)
+    print(job['status'], job.get('error'))
+""")
+
+
+def test_process_executor_with_parallel_render_exits(tmp_path):
+    input_path = str(tmp_path / 'input.avi')
+    out = cv2.VideoWriter(input_path, cv2.VideoWriter_fourcc(*'MJPG'), 30.0, (64, 48))
+    # Enough frames for two segments
+    for i in range(300):
+        out.write(np.full((48, 64, 3), i % 256, np.uint8))
+    out.release()
+
+    env = dict(
+        os.environ,
+        VIDEOMASTER_EXECUTOR='process',
+        VIDEOMASTER_WORKERS='1',
+        VIDEOMASTER_RENDER_WORKERS='2',
+        VIDEOMASTER_JOB_STORE_PATH=str(tmp_path / 'jobs.sqlite3')
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', RUN_JOB, input_path, str(tmp_path / 'output.avi')],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split()[0] == 'completed', result.stdout
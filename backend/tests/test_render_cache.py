@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    os.makedirs(main.RENDER_CACHE_DIR)
+    return main.RENDER_CACHE_DIR
+
+
+def new_job(tmp_path, job_id):
+    return {'status': 'queued', 'progress': 0, 'params': {'output_format': 'mp4'}, 'output_path': str(tmp_path / f"{job_id}.mp4")}
+
+
+def test_hit_links_the_entry(tmp_path, cache_dir):
+    with open(main.get_cache_path('hit', 'mp4'), 'wb') as f:
+        f.write(b'video')
+    job = new_job(tmp_path, 'hit-job')
+    assert main.lookup_cached_render('hit', 'hit-job', job)['cached']
+    with open(job['output_path'], 'rb') as f:
+        assert f.read() == b'video'
+    main.job_store.delete('hit-job')
+
+
+def test_entry_evicted_during_lookup_is_a_miss(tmp_path, cache_dir, monkeypatch):
+    # The entry existed when the request came in but is gone by the time it is linked
+    def evicted(src, dst):
+        raise FileNotFoundError(src)
+    monkeypatch.setattr(main, 'link_or_copy', evicted)
+    misses = main.render_cache_stats['misses']
+    assert main.lookup_cached_render('evicted', 'evicted-job', new_job(tmp_path, 'evicted-job')) is None
+    assert main.render_cache_stats['misses'] == misses + 1
+    assert main.inflight_renders.pop('evicted') == 'evicted-job'
+    main.job_store.delete('evicted-job')
+
+
+def test_eviction_keeps_the_cache_within_its_size(cache_dir, monkeypatch):
+    monkeypatch.setattr(main, 'RENDER_CACHE_SIZE', 10)
+    for i, name in enumerate(('old', 'new')):
+        path = main.get_cache_path(name, 'mp4')
+        with open(path, 'wb') as f:
+            f.write(b'x' * 8)
+        os.utime(path, (1000 + i, 1000 + i))
+    main.evict_render_cache()
+    assert os.listdir(cache_dir) == [os.path.basename(main.get_cache_path('new', 'mp4'))]
+
+
+def test_key_depends_on_whether_the_source_index_was_used():
+    # With an index the range comes from frame timestamps, otherwise from the
+    # nominal frame rate, which differ for variable frame rate video
+    params = {'action': 'trim', 'start_time': 1.0, 'end_time': 2.0, 'output_format': 'mp4'}
+    assert main.get_cache_key('hash', params, True) != main.get_cache_key('hash', params, False)
+    assert main.get_cache_key('hash', params, True) == main.get_cache_key('hash', dict(params, parallel_render=True), True)
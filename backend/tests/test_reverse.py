@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+import pytest
+
+import main
+
+WIDTH, HEIGHT = 64, 48
+FRAMES = 60
+
+
+def write_numbered_video(path, count):
+    # Every frame gets its own gray level and number, so mixed-up frames differ
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30.0, (WIDTH, HEIGHT))
+    for i in range(count):
+        frame = np.full((HEIGHT, WIDTH, 3), i * 4 % 256, np.uint8)
+        cv2.putText(frame, str(i), (2, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        out.write(frame)
+    out.release()
+
+
+def new_stats():
+    return {'frames_read': 0, 'decode_seconds': 0.0, 'prepare_seconds': 0.0}
+
+
+@pytest.mark.parametrize('start_frame', [0, 10])
+def test_reversed_range_matches_forward_decode(tmp_path, monkeypatch, start_frame):
+    path = str(tmp_path / 'numbered.avi')
+    write_numbered_video(path, FRAMES)
+    spec = {'width': WIDTH, 'height': HEIGHT, 'crop': None, 'interpolation': None}
+    # A budget of 20 frames splits the range into several chunks
+    monkeypatch.setattr(main, 'RETIME_MEMORY_BUDGET', 20 * WIDTH * HEIGHT * 3)
+    
+    cap = cv2.VideoCapture(path)
+    try:
+        forward = list(main.read_frames(cap, start_frame, FRAMES - 1, spec, new_stats()))
+    finally:
+        cap.release()
+    cap = cv2.VideoCapture(path)
+    try:
+        backward = list(main.read_frames_reversed(cap, start_frame, FRAMES - 1, spec, new_stats()))
+    finally:
+        cap.release()
+    
+    assert len(forward) == FRAMES - start_frame
+    assert len(backward) == len(forward)
+    for i, (expected, actual) in enumerate(zip(reversed(forward), backward)):
+        assert np.array_equal(expected, actual), f"reversed frame {i} differs"
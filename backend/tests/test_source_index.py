@@ -0,0 +1,51 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def write_two_scene_video(path, count=60):
+    # A red first half and a blue second half with a moving square, so the
+    # only scene cut is at count // 2
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30.0, (64, 48))
+    for i in range(count):
+        frame = np.zeros((48, 64, 3), np.uint8)
+        frame[:] = (0, 0, 200) if i < count // 2 else (200, 0, 0)
+        cv2.rectangle(frame, (i % 50, 10), (i % 50 + 10, 20), (255, 255, 255), -1)
+        out.write(frame)
+    out.release()
+
+
+def test_build_source_index(tmp_path):
+    path = str(tmp_path / 'scenes.avi')
+    write_two_scene_video(path)
+    index = main.build_source_index(path)
+    assert index['frame_count'] == 60
+    assert index['timestamps'][0] == 0
+    assert index['scene_changes'] == [30]
+    assert main.get_frame_at(index, 1.0) == 30
+    assert main.snap_to_scene(index, 25) == 30
+
+
+def test_index_runs_on_the_job_executor(tmp_path):
+    path = str(tmp_path / 'scenes.avi')
+    write_two_scene_video(path)
+    main.submit_index('test', path)
+    deadline = time.monotonic() + 30
+    while 'index_test' in main.index_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert 'index_test' not in main.running_jobs
+    assert main.load_source_index(path)['frame_count'] == 60
+
+
+def test_index_is_rejected_when_the_queue_is_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'JOB_QUEUE_SIZE', 0)
+    monkeypatch.setattr(main, 'running_jobs', {f"busy_{i}" for i in range(main.JOB_WORKERS)})
+    with pytest.raises(HTTPException) as error:
+        main.submit_index('full', str(tmp_path / 'missing.avi'))
+    assert error.value.status_code == 503
+    assert 'index_full' not in main.index_tasks
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+import main
+
+WIDTH, HEIGHT = 64, 48
+
+
+def write_video(path, count):
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30.0, (WIDTH, HEIGHT))
+    for i in range(count):
+        out.write(np.full((HEIGHT, WIDTH, 3), i * 4 % 256, np.uint8))
+    out.release()
+
+
+def render(input_path, output_path, **kwargs):
+    params = {'action': 'negative', 'operations': [{'action': 'negative'}], 'output_format': 'avi'}
+    spec = {
+        'fps': 30.0, 'output_fps': 30.0, 'width': WIDTH, 'height': HEIGHT, 'fourcc': 'MJPG',
+        'start_frame': 0, 'crop': None, 'interpolation': None
+    }
+    return main.render_segment(input_path, output_path, params, spec, 0, 59, **kwargs)
+
+
+def test_segmented_render_writes_the_same_full_file(tmp_path):
+    input_path = str(tmp_path / 'input.avi')
+    write_video(input_path, 60)
+    render(input_path, str(tmp_path / 'plain.avi'))
+    segments = []
+    segmented_path = str(tmp_path / 'segmented.avi')
+    render(input_path, segmented_path, stream_segment_frames=25, on_stream_segment=segments.append)
+    
+    assert segments == [25, 25, 10]
+    for index in range(3):
+        assert os.path.exists(main.get_stream_segment_path(segmented_path, index))
+    with open(tmp_path / 'plain.avi', 'rb') as plain, open(segmented_path, 'rb') as segmented:
+        assert plain.read() == segmented.read()
+
+
+def test_reencoded_parallel_render_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'RENDER_CACHE_DIR', str(tmp_path / 'cache'))
+    output_path = tmp_path / 'edited.mp4'
+    output_path.write_bytes(b'video')
+    job = {'status': 'completed', 'params': {'output_format': 'mp4'}, 'output_path': str(output_path), 'reencoded': True}
+    main.finish_cached_render('reencoded', job)
+    assert not os.path.exists(main.get_cache_path('reencoded', 'mp4'))
+
+
+def segmented_job(tmp_path, **fields):
+    job = {
+        'status': 'processing', 'params': {'segmented': True, 'output_format': 'mp4'},
+        'output_path': str(tmp_path / 'edited.mp4'), 'stream_segments': [4.0]
+    }
+    job.update(fields)
+    main.job_store.create('segmented', job)
+    return 'segmented'
+
+
+def playlist_error(job_id):
+    try:
+        asyncio.run(main.get_job_playlist(job_id))
+    except HTTPException as error:
+        return error.status_code
+    finally:
+        main.job_store.delete(job_id)
+
+
+def test_no_playlist_without_hls_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.shutil, 'which', lambda name: None)
+    assert playlist_error(segmented_job(tmp_path)) == 409
+    assert playlist_error(segmented_job(tmp_path, hls=False)) == 409
+
+
+def test_playlist_lists_hls_segments(tmp_path):
+    job_id = segmented_job(tmp_path, hls=True)
+    try:
+        response = asyncio.run(main.get_job_playlist(job_id))
+    finally:
+        main.job_store.delete(job_id)
+    assert response.media_type == 'application/vnd.apple.mpegurl'
+    assert '#EXTINF:4.0' in response.body.decode() and 'segments/0' in response.body.decode()
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='needs ffmpeg')
+def test_segments_are_converted_to_h264_transport_streams(tmp_path):
+    segment_path = str(tmp_path / 'edited.seg1.mp4')
+    out = cv2.VideoWriter(segment_path, cv2.VideoWriter_fourcc(*'mp4v'), 30.0, (WIDTH, HEIGHT))
+    for i in range(30):
+        out.write(np.full((HEIGHT, WIDTH, 3), i * 8, np.uint8))
+    out.release()
+    hls_path = main.get_hls_segment_path(str(tmp_path / 'edited.mp4'), 1)
+    assert main.convert_hls_segment(segment_path, hls_path, 4.0)
+    with open(hls_path, 'rb') as segment:
+        # MPEG-TS packets start with a sync byte every 188 bytes
+        assert segment.read(377)[::188] == b'GGG'
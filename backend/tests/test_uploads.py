@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import main
+
+
+class ChunkedRequest:
+    # Stands in for a Request whose body arrives in the given chunks
+    def __init__(self, chunks):
+        self.chunks = chunks
+    
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+@pytest.fixture
+def upload():
+    upload = asyncio.run(main.create_upload(filename='clip.mp4', total_size=6))
+    yield upload
+    for suffix in ('json', 'part', 'lock'):
+        path = f"/tmp/upload_{upload['upload_id']}.{suffix}"
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def put(upload_id, chunks, offset):
+    return asyncio.run(main.upload_chunk(upload_id, ChunkedRequest(chunks), offset))
+
+
+def test_put_touches_the_metadata(upload):
+    meta_path = f"/tmp/upload_{upload['upload_id']}.json"
+    old = time.time() - main.UPLOAD_TTL - 60
+    os.utime(meta_path, (old, old))
+    result = put(upload['upload_id'], [b'abc'], 0)
+    assert result['offset'] == 3
+    assert time.time() - os.path.getmtime(meta_path) < 60
+    assert not os.path.exists(f"/tmp/upload_{upload['upload_id']}.lock")
+
+
+def test_concurrent_put_is_rejected(upload):
+    lock_path, _ = main.lock_upload(upload['upload_id'])
+    try:
+        with pytest.raises(HTTPException) as error:
+            put(upload['upload_id'], [b'abc'], 0)
+        assert error.value.status_code == 409
+    finally:
+        os.remove(lock_path)
+    assert main.get_upload_state(upload['upload_id'])['offset'] == 0
+
+
+def test_stale_lock_is_taken_over(upload):
+    lock_path, _ = main.lock_upload(upload['upload_id'])
+    old = time.time() - main.UPLOAD_LOCK_TIMEOUT - 1
+    os.utime(lock_path, (old, old))
+    assert put(upload['upload_id'], [b'abc', b'def'], 0)['complete']
+
+
+def check_upload_request(headers):
+    # Runs the upload size middleware, returning its status code or None when
+    # the request is let through
+    scope = {'type': 'http', 'method': 'POST', 'path': '/sources/', 'headers': [(k.encode(), v.encode()) for k, v in headers.items()]}
+    async def call_next(request):
+        return None
+    response = asyncio.run(main.limit_upload_size(Request(scope), call_next))
+    return response.status_code if response is not None else None
+
+
+def test_chunked_post_is_rejected(monkeypatch):
+    # Without a Content-Length the multipart body could grow past any limit
+    # while it is spooled to disk
+    monkeypatch.setattr(main, 'MAX_UPLOAD_SIZE', 1000)
+    assert check_upload_request({'transfer-encoding': 'chunked'}) == 411
+
+
+def test_post_size_is_checked_against_its_content_length(monkeypatch):
+    monkeypatch.setattr(main, 'MAX_UPLOAD_SIZE', 1000)
+    assert check_upload_request({'content-length': str(1000 + 64 * 1024 + 1)}) == 413
+    assert check_upload_request({'content-length': '1000'}) is None
+
+
+def test_put_that_lost_its_lock_stops_writing_and_keeps_the_new_lock(upload):
+    # The client stalls past UPLOAD_LOCK_TIMEOUT and a second PUT takes over
+    upload_id = upload['upload_id']
+    lock_path = f"/tmp/upload_{upload_id}.lock"
+    taken_over = {}
+
+    class StallingRequest:
+        async def stream(self):
+            yield b'abc'
+            old = time.time() - main.UPLOAD_LOCK_TIMEOUT - 1
+            os.utime(lock_path, (old, old))
+            taken_over['token'] = main.lock_upload(upload_id)[1]
+            yield b'def'
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.upload_chunk(upload_id, StallingRequest(), 0))
+    assert error.value.status_code == 409
+    # Only the bytes written while it held the lock are kept
+    assert main.get_upload_state(upload_id)['offset'] == 3
+    assert main.owns_lock(lock_path, taken_over['token'])
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 
 const API_URL = 'http://localhost:8000';
@@ -18,8 +18,11 @@ function VideoEditor() {
     const [healthInfo, setHealthInfo] = useState(null);
     const [error, setError] = useState(null);
     const [previewFrame, setPreviewFrame] = useState(null);
+    const [sourceId, setSourceId] = useState(null);
     const [activeTab, setActiveTab] = useState('basic');
     const [currentTime, setCurrentTime] = useState(new Date());
+    // Counts source uploads, so only the latest selected file sets sourceId
+    const sourceUpload = useRef(0);
 
     // Video editing states
     const [editingParams, setEditingParams] = useState({
@@ -73,10 +76,71 @@ function VideoEditor() {
         return () => window.removeEventListener('keydown', handleKeyPress);
     }, []);
 
-    const handleFileChange = (event) => {
+    // Release each preview's object URL once it is replaced or the editor unmounts
+    useEffect(() => {
+        return () => {
+            if (previewFrame) URL.revokeObjectURL(previewFrame);
+        };
+    }, [previewFrame]);
+
+    // Render a preview frame with the current effect settings whenever they change.
+    // A request still in flight when the settings or the source change is aborted,
+    // so a stale preview can't replace a newer one.
+    useEffect(() => {
+        if (!sourceId) return;
+        const controller = new AbortController();
+        const timeout = setTimeout(async () => {
+            const formData = new FormData();
+            formData.append('timestamp', editingParams.startTime || 0);
+            Object.entries(editingParams).forEach(([key, value]) => {
+                if (value !== null) {
+                    formData.append(key, value);
+                }
+            });
+            try {
+                const response = await axios.post(`${API_URL}/sources/${sourceId}/preview`, formData, {
+                    responseType: 'blob',
+                    signal: controller.signal
+                });
+                if (!controller.signal.aborted) {
+                    setPreviewFrame(URL.createObjectURL(response.data));
+                }
+            } catch (error) {
+                if (!axios.isCancel(error)) {
+                    console.error('Preview failed:', error);
+                }
+            }
+        }, 150);
+        return () => {
+            clearTimeout(timeout);
+            controller.abort();
+        };
+    }, [sourceId, editingParams]);
+
+    const handleFileChange = async (event) => {
         const selectedFile = event.target.files[0];
         setFile(selectedFile);
-        setVideoUrl(URL.createObjectURL(selectedFile));
+        setVideoUrl(prev => {
+            if (prev) URL.revokeObjectURL(prev);
+            return URL.createObjectURL(selectedFile);
+        });
+        setSourceId(null);
+        setPreviewFrame(null);
+
+        // Upload once so previews and the final job can reuse the source
+        const upload = ++sourceUpload.current;
+        const formData = new FormData();
+        formData.append('file', selectedFile);
+        try {
+            const response = await axios.post(`${API_URL}/sources/`, formData, {
+                headers: { 'Content-Type': 'multipart/form-data' }
+            });
+            if (upload === sourceUpload.current) {
+                setSourceId(response.data.source_id);
+            }
+        } catch (error) {
+            console.error('Source upload failed:', error);
+        }
     };
 
     const updateParams = (key, value) => {
@@ -98,7 +162,11 @@ function VideoEditor() {
         setProgress(0);
 
         const formData = new FormData();
-        formData.append('file', file);
+        if (sourceId) {
+            formData.append('source_id', sourceId);
+        } else {
+            formData.append('file', file);
+        }
         
         // Append all editing parameters
         Object.entries(editingParams).forEach(([key, value]) => {
@@ -349,6 +417,12 @@ function VideoEditor() {
                                 </label>
                             </div>
                         </div>
+                        {previewFrame && (
+                            <div className="relative bg-gray-800 rounded-2xl overflow-hidden border-2 border-white/10">
+                                <img src={previewFrame} alt="Effect preview" className="w-full object-contain" />
+                                <span className="absolute top-2 left-2 px-2 py-1 text-xs text-gray-300 bg-black/50 rounded">Preview</span>
+                            </div>
+                        )}
                     </div>
 
                     {/* Enhanced Controls Panel */}